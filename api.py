@@ -1,23 +1,27 @@
 """
-Flask API for Qwen3-ASR Streaming Inference
+FastAPI API for Qwen3-ASR Streaming Inference
 Works on macOS (with vllm-metal) and Linux/Windows (with CUDA)
 """
+import asyncio
+import heapq
 import os
 import sys
 import time
-import uuid
-from dataclasses import dataclass
-from typing import Dict, Optional
+from contextlib import asynccontextmanager
+from dataclasses import dataclass, field
+from secrets import token_hex
+from typing import AsyncIterator, Callable, Dict, List, Optional, Tuple
 
 # Disable torch.compile on macOS to avoid inductor errors
 if sys.platform == "darwin":
     os.environ.setdefault("TORCH_COMPILE_DISABLE", "1")
 
 import numpy as np
+import orjson
 import torch
-from flask import Flask, jsonify, request
-from flask_cors import CORS
-from qwen_asr import Qwen3ASRModel
+from fastapi import FastAPI, Request
+from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import ORJSONResponse, StreamingResponse
 
 # Register qwen3_asr model type with transformers and vLLM
 from qwen_asr.core.transformers_backend import (
@@ -38,57 +42,201 @@ ModelRegistry.register_model(
     "Qwen3ASRForConditionalGeneration", Qwen3ASRForConditionalGeneration
 )
 
-app = Flask(__name__)
-CORS(app)  # Enable CORS for frontend
+from qwen_asr.inference.qwen3_asr import ASRStreamingState
+from streaming_asr import AsyncQwen3ASRModel
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    await _warmup()
+    tasks = [asyncio.create_task(_batch_loop()), asyncio.create_task(_gc_loop())]
+    yield
+    for task in tasks:
+        task.cancel()
+
+
+app = FastAPI(lifespan=lifespan, default_response_class=ORJSONResponse)
+# Enable CORS for frontend
+app.add_middleware(
+    CORSMiddleware, allow_origins=["*"], allow_methods=["*"], allow_headers=["*"]
+)
 
 # Global ASR model
-asr: Optional[Qwen3ASRModel] = None
+asr: Optional[AsyncQwen3ASRModel] = None
 
 # Streaming parameters
 UNFIXED_CHUNK_NUM = 2
 UNFIXED_TOKEN_NUM = 5
 CHUNK_SIZE_SEC = 2.0
 
+# Largest accepted /api/chunk body: four chunks of float32 samples at 16 kHz
+MAX_CHUNK_BYTES = int(CHUNK_SIZE_SEC * 16000) * 4 * 4
+# Per-session reusable body buffer: two chunks; larger bodies use a one-off buffer
+HOST_BUF_BYTES = int(CHUNK_SIZE_SEC * 16000) * 4 * 2
+
 
 @dataclass
 class Session:
-    state: object
+    state: ASRStreamingState
     created_at: float
     last_seen: float
+    # Serializes chunks of one session; different sessions run concurrently
+    lock: asyncio.Lock = field(default_factory=asyncio.Lock)
+    # Reused request-body buffer, allocated on the first chunk and never grown past
+    # HOST_BUF_BYTES; only touched under lock
+    host_buf: Optional[bytearray] = None
+    # One queue per open /api/stream connection; None marks the end of the session
+    subscribers: List[asyncio.Queue] = field(default_factory=list)
 
 
 SESSIONS: Dict[str, Session] = {}
 SESSION_TTL_SEC = 10 * 60  # 10 minutes
-
-
-def _gc_sessions():
+SESSION_GC_INTERVAL_SEC = 30
+
+# Min-heap of (expiry, session_id), one entry per session. Touches only bump last_seen;
+# the GC re-pushes a session whose last_seen moved on when its old entry comes due.
+_EXPIRY_HEAP: List[Tuple[float, str]] = []
+
+# Pending chunks: (wav, state, session_id, partial-result callback, future resolved with the updated state)
+PendingChunk = Tuple[
+    np.ndarray, ASRStreamingState, str, Optional[Callable[[str, str], None]], asyncio.Future
+]
+CHUNK_QUEUE: "asyncio.Queue[PendingChunk]" = asyncio.Queue()
+_BATCH_TASKS: set = set()  # strong refs so in-flight batches are not garbage collected
+
+
+def _error(message: str, status_code: int) -> ORJSONResponse:
+    return ORJSONResponse({"error": message}, status_code=status_code)
+
+
+def _result(state: ASRStreamingState) -> Dict[str, str]:
+    # init_streaming_state() sets both fields to "" and every decode step overwrites them
+    return {"language": state.language, "text": state.text}
+
+
+async def _read_body(request: Request, mv: memoryview) -> bool:
+    """Stream the request body into mv; False if the body is shorter than mv."""
+    n = len(mv)
+    off = 0
+    async for part in request.stream():
+        end = min(off + len(part), n)
+        mv[off:end] = memoryview(part)[: end - off]
+        off = end
+        if off == n:
+            break
+    return off == n
+
+
+async def _run_batch(batch: List[PendingChunk]):
+    wavs, states, session_ids, on_updates, futures = zip(*batch)
+    try:
+        results = await asr.streaming_transcribe_batch(
+            list(wavs), list(states), list(session_ids), list(on_updates)
+        )
+    except Exception as e:
+        results = [e] * len(batch)
+    for fut, res in zip(futures, results):
+        if fut.done():
+            continue
+        if isinstance(res, BaseException):
+            fut.set_exception(res)
+        else:
+            fut.set_result(res)
+
+
+async def _batch_loop():
+    """Submit every queued chunk together; batches run concurrently and never wait on each other."""
+    while True:
+        batch = [await CHUNK_QUEUE.get()]
+        while not CHUNK_QUEUE.empty():
+            batch.append(CHUNK_QUEUE.get_nowait())
+        # The engine keeps batching across these at the iteration level
+        task = asyncio.create_task(_run_batch(batch))
+        _BATCH_TASKS.add(task)
+        task.add_done_callback(_BATCH_TASKS.discard)
+
+
+def _publisher(s: Session) -> Optional[Callable[[str, str], None]]:
+    """Callback pushing partial results to the session's SSE subscribers, if any."""
+    if not s.subscribers:
+        return None
+
+    def publish(language: str, text: str):
+        for q in s.subscribers:
+            q.put_nowait({"language": language, "text": text})
+
+    return publish
+
+
+def _close_subscribers(s: Session):
+    final = _result(s.state)
+    for q in s.subscribers:
+        q.put_nowait(final)
+        q.put_nowait(None)
+
+
+async def _sse_events(s: Session, q: asyncio.Queue) -> AsyncIterator[bytes]:
+    try:
+        while True:
+            update = await q.get()
+            if update is None:
+                break
+            yield b"data: " + orjson.dumps(update) + b"\n\n"
+    finally:
+        s.subscribers.remove(q)
+
+
+async def _gc_sessions():
     """Garbage collect expired sessions."""
     now = time.time()
-    dead = [sid for sid, s in SESSIONS.items() if now - s.last_seen > SESSION_TTL_SEC]
-    for sid in dead:
+    expired = []
+    while _EXPIRY_HEAP and _EXPIRY_HEAP[0][0] < now:
+        _, sid = heapq.heappop(_EXPIRY_HEAP)
+        s = SESSIONS.get(sid)
+        if s is None:
+            continue  # already finished
+        expiry = s.last_seen + SESSION_TTL_SEC
+        if expiry >= now:
+            heapq.heappush(_EXPIRY_HEAP, (expiry, sid))
+        else:
+            expired.append((sid, SESSIONS.pop(sid)))
+    if asr and expired:
+        await asyncio.gather(
+            *(_finish_expired(sid, s) for sid, s in expired),
+            return_exceptions=True,
+        )
+
+
+async def _finish_expired(session_id: str, s: Session):
+    async with s.lock:
         try:
-            if asr:
-                asr.finish_streaming_transcribe(SESSIONS[sid].state)
-        except Exception:
-            pass
-        SESSIONS.pop(sid, None)
+            await asr.finish_streaming_transcribe_async(s.state, session_id)
+        finally:
+            _close_subscribers(s)
+
+
+async def _gc_loop():
+    """Expire idle sessions in the background, off the request path."""
+    while True:
+        await asyncio.sleep(SESSION_GC_INTERVAL_SEC)
+        await _gc_sessions()
 
 
 def _get_session(session_id: str) -> Optional[Session]:
-    _gc_sessions()
     s = SESSIONS.get(session_id)
     if s:
         s.last_seen = time.time()
     return s
 
 
-@app.route("/api/start", methods=["POST"])
-def api_start():
+@app.post("/api/start")
+async def api_start():
     """Start a new transcription session."""
     if not asr:
-        return jsonify({"error": "Model not loaded"}), 500
+        return _error("Model not loaded", 500)
 
-    session_id = uuid.uuid4().hex
+    session_id = token_hex(8)
+    # Keep the prompt identical across sessions (no per-session context) so it hits the prefix cache
     state = asr.init_streaming_state(
         unfixed_chunk_num=UNFIXED_CHUNK_NUM,
         unfixed_token_num=UNFIXED_TOKEN_NUM,
@@ -96,68 +244,130 @@ def api_start():
     )
     now = time.time()
     SESSIONS[session_id] = Session(state=state, created_at=now, last_seen=now)
-    return jsonify({"session_id": session_id})
+    heapq.heappush(_EXPIRY_HEAP, (now + SESSION_TTL_SEC, session_id))
+    return ORJSONResponse({"session_id": session_id})
 
 
-@app.route("/api/chunk", methods=["POST"])
-def api_chunk():
+@app.post("/api/chunk")
+async def api_chunk(request: Request, session_id: str = ""):
     """Process an audio chunk."""
     if not asr:
-        return jsonify({"error": "Model not loaded"}), 500
+        return _error("Model not loaded", 500)
 
-    session_id = request.args.get("session_id", "")
     s = _get_session(session_id)
     if not s:
-        return jsonify({"error": "Invalid session_id"}), 400
-
-    if request.mimetype != "application/octet-stream":
-        return jsonify({"error": "Expected application/octet-stream"}), 400
-
-    raw = request.get_data(cache=False)
-    if len(raw) % 4 != 0:
-        return jsonify({"error": "Float32 bytes length not multiple of 4"}), 400
-
-    wav = np.frombuffer(raw, dtype=np.float32).reshape(-1)
-
-    asr.streaming_transcribe(wav, s.state)
-
-    return jsonify({
-        "language": getattr(s.state, "language", "") or "",
-        "text": getattr(s.state, "text", "") or "",
-    })
-
-
-@app.route("/api/finish", methods=["POST"])
-def api_finish():
+        return _error("Invalid session_id", 400)
+
+    mimetype = request.headers.get("content-type", "").split(";", 1)[0].strip().lower()
+    if mimetype != "application/octet-stream":
+        return _error("Expected application/octet-stream", 400)
+
+    try:
+        n = int(request.headers["content-length"])
+    except (KeyError, ValueError):
+        return _error("Content-Length required", 411)
+    if n > MAX_CHUNK_BYTES:
+        return _error(f"Chunk larger than {MAX_CHUNK_BYTES} bytes", 413)
+    if n < 0 or n % 4 != 0:
+        return _error("Float32 bytes length not multiple of 4", 400)
+
+    async with s.lock:
+        # n <= MAX_CHUNK_BYTES; bodies beyond HOST_BUF_BYTES get a temporary buffer
+        if n > HOST_BUF_BYTES:
+            buf = bytearray(n)
+        else:
+            if s.host_buf is None or len(s.host_buf) < n:
+                s.host_buf = bytearray(n)
+            buf = s.host_buf
+        mv = memoryview(buf)[:n]
+        if not await _read_body(request, mv):
+            return _error("Body shorter than Content-Length", 400)
+
+        # Safe to reuse host_buf afterwards: the streaming step copies wav into its state buffer
+        wav = np.frombuffer(mv, dtype=np.float32)
+        if s.state.buffer.shape[0] + wav.shape[0] < s.state.chunk_size_samples:
+            # Not enough audio for a decode step: just buffer it, no engine work to batch
+            await asr.streaming_transcribe_async(wav, s.state, request_id=session_id)
+        else:
+            fut = asyncio.get_running_loop().create_future()
+            CHUNK_QUEUE.put_nowait((wav, s.state, session_id, _publisher(s), fut))
+            await fut
+
+    return ORJSONResponse(_result(s.state))
+
+
+@app.post("/api/finish")
+async def api_finish(session_id: str = ""):
     """Finish a transcription session and get final result."""
     if not asr:
-        return jsonify({"error": "Model not loaded"}), 500
+        return _error("Model not loaded", 500)
 
-    session_id = request.args.get("session_id", "")
     s = _get_session(session_id)
     if not s:
-        return jsonify({"error": "Invalid session_id"}), 400
+        return _error("Invalid session_id", 400)
 
-    asr.finish_streaming_transcribe(s.state)
-    out = {
-        "language": getattr(s.state, "language", "") or "",
-        "text": getattr(s.state, "text", "") or "",
-    }
+    async with s.lock:
+        try:
+            await asr.finish_streaming_transcribe_async(
+                s.state, request_id=session_id, on_update=_publisher(s)
+            )
+        finally:
+            _close_subscribers(s)
+    out = _result(s.state)
     SESSIONS.pop(session_id, None)
-    return jsonify(out)
+    return ORJSONResponse(out)
+
 
+@app.get("/api/stream")
+async def api_stream(session_id: str = ""):
+    """Stream partial results of a session as Server-Sent Events."""
+    # Events are {"language", "text"} snapshots pushed as tokens are generated; each one
+    # replaces the previous (prefix rollback can revise the tail). Ends on finish/expiry.
+    s = _get_session(session_id)
+    if not s:
+        return _error("Invalid session_id", 400)
+
+    q: asyncio.Queue = asyncio.Queue()
+    s.subscribers.append(q)
+    return StreamingResponse(
+        _sse_events(s, q),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
 
-@app.route("/health", methods=["GET"])
-def health():
+
+@app.get("/health")
+async def health():
     """Health check endpoint."""
-    return jsonify({
+    return ORJSONResponse({
         "status": "ok",
         "model_loaded": asr is not None,
     })
 
 
-def load_model(model_path: str = "Qwen/Qwen3-ASR-1.7B"):
-    """Load the ASR model."""
+async def _warmup():
+    """Decode a dummy stream so one-time compilation happens before the first real chunk."""
+    if not asr:
+        return
+    silence = np.zeros(int(CHUNK_SIZE_SEC * 16000 * 1.5), dtype=np.float32)
+    state = asr.init_streaming_state(
+        unfixed_chunk_num=UNFIXED_CHUNK_NUM,
+        unfixed_token_num=UNFIXED_TOKEN_NUM,
+        chunk_size_sec=CHUNK_SIZE_SEC,
+    )
+    # One full chunk, then the half-chunk tail via finish: covers both input shapes
+    await asr.streaming_transcribe_async(silence, state, request_id="warmup")
+    await asr.finish_streaming_transcribe_async(state, request_id="warmup")
+    print("Model warmed up")
+
+
+def load_model(model_path: str = "Qwen/Qwen3-ASR-1.7B", quantization: str = "none"):
+    """Load the ASR model.
+
+    quantization: vLLM quantization method, "none" (default), "fp8", or "auto" (FP8 on CUDA
+    compute capability >= 8.0). FP8 is lossy and opt-in until its WER delta has been measured.
+    Pre-quantized methods such as "awq"/"gptq" need a matching checkpoint.
+    """
     global asr
 
     has_cuda = torch.cuda.is_available()
@@ -172,21 +382,49 @@ def load_model(model_path: str = "Qwen/Qwen3-ASR-1.7B"):
     if has_cuda:
         model_kwargs["gpu_memory_utilization"] = 0.9
         model_kwargs["max_model_len"] = 4096
-        model_kwargs["enforce_eager"] = True
+        # Short, regularly shaped decodes are launch-overhead bound: keep CUDA graphs on
+        model_kwargs["enforce_eager"] = False
+        # Every chunk re-feeds the session's audio with the same ASR prompt header;
+        # reuse the KV blocks of the shared prefix instead of prefilling it again
+        model_kwargs["enable_prefix_caching"] = True
+        model_kwargs["block_size"] = 16
+
+        if quantization == "auto":
+            # FP8 weights halve weight bytes for the bandwidth-bound decode: native on
+            # Ada/Hopper, weight-only (Marlin) on Ampere
+            quantization = "fp8" if torch.cuda.get_device_capability()[0] >= 8 else "none"
+        if quantization != "none":
+            model_kwargs["quantization"] = quantization
+        print(f"Quantization: {quantization}")
 
     print(f"Loading model: {model_path}")
-    asr = Qwen3ASRModel.LLM(**model_kwargs)
+    asr = AsyncQwen3ASRModel.AsyncLLM(**model_kwargs)
     print("Model loaded successfully!")
 
 
 if __name__ == "__main__":
     import argparse
 
+    import uvicorn
+
     parser = argparse.ArgumentParser(description="Qwen3-ASR Streaming API")
     parser.add_argument("--model", default="Qwen/Qwen3-ASR-1.7B", help="Model path")
     parser.add_argument("--host", default="0.0.0.0", help="Host to bind")
     parser.add_argument("--port", type=int, default=5000, help="Port to listen on")
+    parser.add_argument(
+        "--quantization",
+        default="none",
+        help='vLLM quantization method ("none", "fp8", "auto" = fp8 if supported, ...); '
+        "CUDA only. FP8 is opt-in until its WER impact is measured",
+    )
     args = parser.parse_args()
 
-    load_model(args.model)
-    app.run(host=args.host, port=args.port, debug=False, threaded=True)
+    load_model(args.model, quantization=args.quantization)
+    # Single worker: the model and sessions live in this process. uvloop is not available on Windows.
+    uvicorn.run(
+        app,
+        host=args.host,
+        port=args.port,
+        workers=1,
+        loop="asyncio" if sys.platform == "win32" else "uvloop",
+    )
@@ -0,0 +1,212 @@
+"""
+Async streaming wrapper around Qwen3-ASR backed by vLLM's AsyncLLMEngine
+"""
+import asyncio
+from typing import Callable, List, Optional
+
+import numpy as np
+from qwen_asr import Qwen3ASRModel
+from qwen_asr.core.transformers_backend import Qwen3ASRProcessor
+from qwen_asr.inference.qwen3_asr import ASRStreamingState
+from qwen_asr.inference.utils import parse_asr_output
+from vllm import AsyncEngineArgs, AsyncLLMEngine, SamplingParams
+
+# Receives (language, text) snapshots while a decode step is still generating
+UpdateCallback = Callable[[str, str], None]
+
+
+class AsyncQwen3ASRModel(Qwen3ASRModel):
+    """
+    Qwen3-ASR streaming model driven by vLLM's AsyncLLMEngine.
+
+    Prompt building and streaming state are shared with Qwen3ASRModel; only the
+    decode step differs. Each step is submitted to the async engine and awaited,
+    so chunks from concurrent sessions are scheduled together by vLLM's continuous
+    batching instead of serializing on the blocking LLM.generate().
+    """
+
+    @classmethod
+    def AsyncLLM(
+        cls,
+        model: str,
+        max_new_tokens: Optional[int] = 4096,
+        **kwargs,
+    ) -> "AsyncQwen3ASRModel":
+        """
+        Initialize using the vLLM async engine.
+
+        Args:
+            model:
+                Model path/repo for vLLM.
+            max_new_tokens:
+                Maximum number of tokens to generate per decode step.
+            **kwargs:
+                Forwarded to vllm.AsyncEngineArgs(...).
+        """
+        engine = AsyncLLMEngine.from_engine_args(AsyncEngineArgs(model=model, **kwargs))
+        processor = Qwen3ASRProcessor.from_pretrained(model, fix_mistral_regex=True)
+        sampling_params = SamplingParams(temperature=0.0, max_tokens=max_new_tokens)
+
+        return cls(
+            backend="vllm",
+            model=engine,
+            processor=processor,
+            sampling_params=sampling_params,
+            max_new_tokens=None,
+        )
+
+    def streaming_transcribe(self, pcm16k: np.ndarray, state: ASRStreamingState) -> ASRStreamingState:
+        raise NotImplementedError(
+            "AsyncQwen3ASRModel runs on AsyncLLMEngine; use "
+            "`await streaming_transcribe_async(pcm16k, state, request_id)` instead."
+        )
+
+    def finish_streaming_transcribe(self, state: ASRStreamingState) -> ASRStreamingState:
+        raise NotImplementedError(
+            "AsyncQwen3ASRModel runs on AsyncLLMEngine; use "
+            "`await finish_streaming_transcribe_async(state, request_id)` instead."
+        )
+
+    def _rollback_prefix(self, state: ASRStreamingState) -> str:
+        """Previous output minus the last unfixed_token_num tokens (no broken UTF-8 at the cut)."""
+        if state.chunk_id < state.unfixed_chunk_num:
+            return ""
+        cur_ids = self.processor.tokenizer.encode(state._raw_decoded)
+        k = int(state.unfixed_token_num)
+        while True:
+            end_idx = max(0, len(cur_ids) - k)
+            if end_idx == 0:
+                return ""
+            prefix = self.processor.tokenizer.decode(cur_ids[:end_idx])
+            if "\ufffd" not in prefix:
+                return prefix
+            k += 1
+
+    async def _decode(
+        self,
+        state: ASRStreamingState,
+        prefix: str,
+        request_id: str,
+        on_update: Optional[UpdateCallback] = None,
+    ) -> None:
+        """
+        Run one decode step over state.audio_accum and update state.language/state.text.
+
+        If on_update is given, it is called with the parsed partial result every time
+        the engine emits new text for this step.
+        """
+        inp = {
+            "prompt": state.prompt_raw + prefix,
+            "multi_modal_data": {"audio": [state.audio_accum]},
+        }
+
+        final = None
+        async for out in self.model.generate(
+            inp, self.sampling_params, request_id=f"{request_id}-{state.chunk_id}"
+        ):
+            text = out.outputs[0].text
+            if on_update is not None and (final is None or text != final.outputs[0].text):
+                on_update(*parse_asr_output(prefix + text, user_language=state.force_language))
+            final = out
+        gen_text = final.outputs[0].text if final is not None else ""
+
+        state._raw_decoded = prefix + gen_text
+        state.language, state.text = parse_asr_output(
+            state._raw_decoded, user_language=state.force_language
+        )
+        state.chunk_id += 1
+
+    async def streaming_transcribe_async(
+        self,
+        pcm16k: np.ndarray,
+        state: ASRStreamingState,
+        request_id: str,
+        on_update: Optional[UpdateCallback] = None,
+    ) -> ASRStreamingState:
+        """
+        Async counterpart of Qwen3ASRModel.streaming_transcribe().
+
+        Buffers pcm16k and runs one decode step per full chunk. request_id prefixes
+        the vLLM request ids, so steps stay traceable to their session.
+        """
+        if state is None:
+            raise ValueError("state must not be None. Call init_streaming_state() first.")
+        if pcm16k is None:
+            raise ValueError("pcm16k must not be None.")
+
+        x = np.asarray(pcm16k).reshape(-1)
+        if x.dtype == np.int16:
+            x = x.astype(np.float32) / 32768.0
+        else:
+            x = x.astype(np.float32, copy=False)
+
+        if x.shape[0] > 0:
+            state.buffer = np.concatenate([state.buffer, x], axis=0)
+
+        while state.buffer.shape[0] >= state.chunk_size_samples:
+            chunk = state.buffer[: state.chunk_size_samples]
+            state.buffer = state.buffer[state.chunk_size_samples :]
+
+            if state.audio_accum.shape[0] == 0:
+                state.audio_accum = chunk
+            else:
+                state.audio_accum = np.concatenate([state.audio_accum, chunk], axis=0)
+
+            await self._decode(state, self._rollback_prefix(state), request_id, on_update)
+
+        return state
+
+    async def streaming_transcribe_batch(
+        self,
+        wavs: List[np.ndarray],
+        states: List[ASRStreamingState],
+        request_ids: List[str],
+        on_updates: Optional[List[Optional[UpdateCallback]]] = None,
+    ) -> List[object]:
+        """
+        Run streaming_transcribe_async() for several independent streams at once.
+
+        All decode steps are submitted to the engine in the same event-loop tick, so
+        vLLM schedules their prefills into one batch. States must belong to distinct
+        streams. Returns one entry per stream: the updated state, or the exception
+        raised for that stream.
+        """
+        if on_updates is None:
+            on_updates = [None] * len(states)
+        return await asyncio.gather(
+            *(
+                self.streaming_transcribe_async(w, st, rid, cb)
+                for w, st, rid, cb in zip(wavs, states, request_ids, on_updates)
+            ),
+            return_exceptions=True,
+        )
+
+    async def finish_streaming_transcribe_async(
+        self,
+        state: ASRStreamingState,
+        request_id: str,
+        on_update: Optional[UpdateCallback] = None,
+    ) -> ASRStreamingState:
+        """Async counterpart of Qwen3ASRModel.finish_streaming_transcribe()."""
+        if state is None:
+            raise ValueError("state must not be None.")
+
+        if state.buffer is None or state.buffer.shape[0] == 0:
+            return state
+
+        tail = state.buffer
+        state.buffer = np.zeros((0,), dtype=np.float32)
+
+        if state.audio_accum.shape[0] == 0:
+            state.audio_accum = tail
+        else:
+            state.audio_accum = np.concatenate([state.audio_accum, tail], axis=0)
+
+        prefix = ""
+        if state.chunk_id >= state.unfixed_chunk_num:
+            cur_ids = self.processor.tokenizer.encode(state._raw_decoded)
+            end_idx = max(1, len(cur_ids) - int(state.unfixed_token_num))
+            prefix = self.processor.tokenizer.decode(cur_ids[:end_idx])
+
+        await self._decode(state, prefix, request_id, on_update)
+        return state
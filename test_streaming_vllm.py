@@ -2,6 +2,7 @@
 Qwen3-ASR Streaming Inference Demo with vLLM Backend
 Works on macOS (with vllm-metal) and Linux/Windows (with CUDA)
 """
+import math
 import os
 import sys
 
@@ -14,19 +15,27 @@ import soundfile as sf
 import torch
 from qwen_asr import Qwen3ASRModel
 
+try:
+    import soxr
+except ImportError:  # fall back to scipy's polyphase resampler
+    soxr = None
+
 
 def resample_to_16k(wav: np.ndarray, sr: int) -> np.ndarray:
-    """Resample audio to 16kHz using linear interpolation."""
+    """Resample audio to 16kHz (soxr if available, else scipy polyphase)."""
     if sr == 16000:
-        return wav.astype(np.float32, copy=False)
+        # No-op (same object) for contiguous float32, the common soundfile case
+        return np.ascontiguousarray(wav, dtype=np.float32)
     wav = wav.astype(np.float32, copy=False)
-    dur = wav.shape[0] / float(sr)
-    n16 = int(round(dur * 16000))
-    if n16 <= 0:
-        return np.zeros((0,), dtype=np.float32)
-    x_old = np.linspace(0.0, dur, num=wav.shape[0], endpoint=False)
-    x_new = np.linspace(0.0, dur, num=n16, endpoint=False)
-    return np.interp(x_new, x_old, wav).astype(np.float32)
+    if wav.shape[0] == 0:
+        return wav
+    if soxr is not None:
+        return soxr.resample(wav, sr, 16000, quality="QQ")
+
+    from scipy.signal import resample_poly
+
+    g = math.gcd(sr, 16000)
+    return resample_poly(wav, 16000 // g, sr // g).astype(np.float32, copy=False)
 
 
 if __name__ == '__main__':